@@ -1,9 +1,87 @@
 #include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
+#include <limits>
+#include <stdexcept>
+#include <string>
+#include <vector>
 #include "order_book.hpp"
 #include "pair_strategy.hpp"
 
 namespace py = pybind11;
 
+// Input arrays are converted to contiguous buffers of the expected dtype (no copy if already matching)
+template <typename T>
+using input_array = py::array_t<T, py::array::c_style | py::array::forcecast>;
+
+// Dictionary codes are never cast: wider indices (e.g. uint16 codes of an ENUM with more than 255 values)
+// would be truncated into valid-looking uint8 codes, so they are rejected instead
+using code_array = py::array_t<uint8_t, py::array::c_style>;
+
+// Batch entry points take parallel per-tick arrays: reject mismatched lengths before touching raw pointers
+template <typename... Rest>
+static py::ssize_t batch_length(const py::array& first, const Rest&... rest) {
+    const py::ssize_t n = first.size();
+    if (((rest.size() != n) || ...))
+        throw std::invalid_argument("input arrays must have the same length");
+    return n;
+}
+
+// Batch outputs go to new arrays, or to the caller's preallocated ones passed as an 'out' tuple
+// (e.g. one set of buffers reused for every batch of a stream)
+static std::vector<py::object> output_slots(const py::object& out, std::size_t count) {
+    if (out.is_none()) return std::vector<py::object>(count, py::none());
+    py::tuple slots = py::cast<py::tuple>(out);
+    if (slots.size() != count)
+        throw std::invalid_argument("out must be a tuple of " + std::to_string(count) + " arrays");
+    std::vector<py::object> result;
+    for (py::handle slot : slots) result.push_back(py::reinterpret_borrow<py::object>(slot));
+    return result;
+}
+
+// A provided output array is written in place: it must be C-contiguous, writeable, of the exact dtype and length n
+template <typename T>
+static py::array_t<T, py::array::c_style> output_array(const py::object& slot, py::ssize_t n) {
+    if (slot.is_none()) return py::array_t<T, py::array::c_style>(n);
+    if (!py::isinstance<py::array_t<T, py::array::c_style>>(slot))
+        throw py::type_error("out arrays must be C-contiguous with the dtype of the output");
+    auto array = py::reinterpret_borrow<py::array_t<T, py::array::c_style>>(slot);
+    if (array.size() != n)
+        throw std::invalid_argument("out arrays must have the length of the input arrays");
+    return array;
+}
+
+// Runs one batch call: the per-tick outputs (OBI, signal and, when trading, position and cash flow)
+// are allocated or taken from 'out', then the engine loop runs without the GIL
+template <typename Feed>
+static py::tuple run_batch(py::ssize_t n, const py::object& out, bool trade, Feed feed) {
+    const auto slots = output_slots(out, trade ? 4 : 2);
+    auto obi = output_array<float>(slots[0], n);
+    auto signal = output_array<int8_t>(slots[1], n);
+    BatchOutputs outputs{obi.mutable_data(), signal.mutable_data()};
+    if (!trade) {
+        {
+            py::gil_scoped_release release;
+            feed(outputs);
+        }
+        return py::make_tuple(obi, signal);
+    }
+
+    auto position = output_array<int8_t>(slots[2], n);
+    auto cash = output_array<double>(slots[3], n);
+    outputs.position = position.mutable_data();
+    outputs.cash = cash.mutable_data();
+    {
+        py::gil_scoped_release release;
+        feed(outputs);
+    }
+    return py::make_tuple(obi, signal, position, cash);
+}
+
+// Calls that only touch C++ state release the GIL, so Python threads such as the Streamlit server
+// keep running while the engine works. Only the order books lock their writers: the PairStrategy
+// portfolio (position, cash, last leader price) is unprotected, so a strategy must not be shared
+// between threads. Run one PairStrategy per thread instead
+
 // This defines the python module "engine_core"
 PYBIND11_MODULE(engine_core, m) {
     m.doc() = "High-Frequency C++ Trading Engine";
@@ -11,16 +89,69 @@ PYBIND11_MODULE(engine_core, m) {
     // Bind OrderBook class
     py::class_<OrderBook>(m, "OrderBook")
         .def(py::init<>())
-        .def("add_order", &OrderBook::add_order)
+        .def("add_order", &OrderBook::add_order, py::call_guard<py::gil_scoped_release>())
         .def("get_imbalance", &OrderBook::get_imbalance)
         .def("clear", &OrderBook::clear)
         .def("get_bid_count", &OrderBook::get_bid_count)
         .def("get_ask_count", &OrderBook::get_ask_count);
 
     // Bind PairStrategy class
-    py::class_<PairStrategy>(m, "PairStrategy")
+    py::class_<PairStrategy>(m, "PairStrategy",
+                             "Leader/follower strategy with its own books and portfolio. Not thread safe: "
+                             "use one instance per thread.")
         .def(py::init<double>())
-        .def("on_market_data", &PairStrategy::on_market_data)
+        .def("on_market_data", &PairStrategy::on_market_data, py::call_guard<py::gil_scoped_release>())
+        .def("on_market_data_batch",
+             [](PairStrategy& self, input_array<int8_t> symbol_type, input_array<float> price,
+                input_array<float> quantity, input_array<bool> is_bid, py::object out) {
+                 const py::ssize_t n = batch_length(symbol_type, price, quantity, is_bid);
+                 const TypedTicks ticks{symbol_type.data(), is_bid.data()};
+                 return run_batch(n, out, false, [&](const BatchOutputs& outputs) {
+                     self.feed_batch(ticks, price.data(), quantity.data(), static_cast<std::size_t>(n), outputs);
+                 });
+             },
+             py::arg("symbol_type"), py::arg("price"), py::arg("quantity"), py::arg("is_bid"),
+             py::arg("out") = py::none(),
+             "Feed a batch of ticks and return the per-tick (leader OBI, signal) arrays "
+             "(written into out=(obi, signal) when given).")
+        .def("run_backtest",
+             [](PairStrategy& self, input_array<int8_t> symbol_type, input_array<float> price,
+                input_array<float> quantity, input_array<bool> is_bid, bool allow_short, double initial_capital,
+                py::object out) {
+                 const py::ssize_t n = batch_length(symbol_type, price, quantity, is_bid);
+                 const TypedTicks ticks{symbol_type.data(), is_bid.data()};
+                 return run_batch(n, out, true, [&](const BatchOutputs& outputs) {
+                     self.feed_batch(ticks, price.data(), quantity.data(), static_cast<std::size_t>(n),
+                                     outputs, allow_short, initial_capital);
+                 });
+             },
+             py::arg("symbol_type"), py::arg("price"), py::arg("quantity"), py::arg("is_bid"),
+             py::arg("allow_short") = false,
+             py::arg("initial_capital") = std::numeric_limits<double>::infinity(), py::arg("out") = py::none(),
+             "Feed a batch of ticks and simulate the follower portfolio in C++. Returns per-tick "
+             "(leader OBI, signal, position, cash flow) arrays (written into out when given); the portfolio "
+             "carries over between calls. A Long entry is skipped when initial_capital plus the cash flow "
+             "cannot pay the price (no limit by default).")
+        .def("run_backtest_encoded",
+             [](PairStrategy& self, code_array symbol_code, uint8_t leader_code,
+                input_array<float> price, input_array<float> quantity,
+                code_array side_code, uint8_t bid_code, bool allow_short, double initial_capital,
+                py::object out) {
+                 const py::ssize_t n = batch_length(symbol_code, price, quantity, side_code);
+                 const EncodedTicks ticks{symbol_code.data(), leader_code, side_code.data(), bid_code};
+                 return run_batch(n, out, true, [&](const BatchOutputs& outputs) {
+                     self.feed_batch(ticks, price.data(), quantity.data(), static_cast<std::size_t>(n),
+                                     outputs, allow_short, initial_capital);
+                 });
+             },
+             py::arg("symbol_code"), py::arg("leader_code"), py::arg("price"), py::arg("quantity"),
+             py::arg("side_code"), py::arg("bid_code"), py::arg("allow_short") = false,
+             py::arg("initial_capital") = std::numeric_limits<double>::infinity(), py::arg("out") = py::none(),
+             "Same as run_backtest for dictionary-encoded ticks: uint8 codes (e.g. Arrow dictionary "
+             "indices, read without copy), a leader tick has symbol_code == leader_code and a bid "
+             "side_code == bid_code.")
+        .def("reset", &PairStrategy::reset, py::call_guard<py::gil_scoped_release>(),
+             "Clear both books and the portfolio to start a new run with the same strategy.")
         .def("check_signals", &PairStrategy::check_signals)
         .def("get_leader_imbalance", &PairStrategy::get_leader_imbalance);
-}
\ No newline at end of file
+}
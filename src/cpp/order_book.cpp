@@ -2,40 +2,55 @@
 #include <numeric>
 
 // Construtor implementation
-OrderBook::OrderBook() {}
+OrderBook::OrderBook() {
+    static_assert(std::atomic<double>::is_always_lock_free, "the imbalance must be readable without a lock");
+}
 
 void OrderBook::add_order(double price, double quantity, bool is_bid) {
     std::lock_guard<std::mutex> lock(mtx);
-    auto new_order = std::make_unique<Order>(price, quantity);
 
-    if (is_bid) bids.push_back(std::move(new_order));
-    else asks.push_back(std::move(new_order));
+    if (is_bid) {
+        bid_prices.push_back(static_cast<float>(price));
+        bid_qtys.push_back(static_cast<float>(quantity));
+        total_bid_vol += quantity;
+    } else {
+        ask_prices.push_back(static_cast<float>(price));
+        ask_qtys.push_back(static_cast<float>(quantity));
+        total_ask_vol += quantity;
+    }
+    publish_imbalance();
 }
 
 double OrderBook::get_imbalance() {
-    std::lock_guard<std::mutex> lock(mtx);
-    double total_bid_vol = 0.0, total_ask_vol = 0.0;
+    // Lock-free: the acquire load pairs with the release store of the last writer
+    return imbalance.load(std::memory_order_acquire);
+}
 
-    for (const auto& bid : bids) total_bid_vol += bid->quantity;
-    for (const auto& ask : asks) total_ask_vol += ask->quantity;
+void OrderBook::publish_imbalance() {
     double total_vol = total_bid_vol + total_ask_vol;
 
-    if (total_vol == 0) return 0.0; // Avoid division by zero
-    return (total_bid_vol - total_ask_vol) / total_vol;
+    // Avoid division by zero
+    double obi = (total_vol == 0) ? 0.0 : (total_bid_vol - total_ask_vol) / total_vol;
+    imbalance.store(obi, std::memory_order_release);
 }
 
 void OrderBook::clear() {
     std::lock_guard<std::mutex> lock(mtx);
-    bids.clear();
-    asks.clear();
+    bid_prices.clear();
+    bid_qtys.clear();
+    ask_prices.clear();
+    ask_qtys.clear();
+    total_bid_vol = 0.0;
+    total_ask_vol = 0.0;
+    publish_imbalance();
 }   
 
 int OrderBook::get_bid_count() {
     std::lock_guard<std::mutex> lock(mtx);
-    return bids.size();
+    return bid_qtys.size();
 }
 
 int OrderBook::get_ask_count() {
     std::lock_guard<std::mutex> lock(mtx);
-    return asks.size();
+    return ask_qtys.size();
 }
\ No newline at end of file
@@ -1,20 +1,26 @@
 #pragma once 
 #include <vector>
-#include <memory>
 #include <mutex>
-
-// Structure for a single order
-struct Order {
-    double price;
-    double quantity;
-    Order(double p, double q) : price(p), quantity(q) {}
-};
+#include <atomic>
 
 class OrderBook {
     private:
-        std::vector<std::unique_ptr<Order>> bids;
-        std::vector<std::unique_ptr<Order>> asks;
-        mutable std::mutex mtx;
+        // Structure of arrays: one contiguous column per field and side (no allocation per order),
+        // so a pass over the quantities streams only the quantities
+        std::vector<float> bid_prices, bid_qtys;
+        std::vector<float> ask_prices, ask_qtys;
+        mutable std::mutex mtx; // Serializes writers (and the order counts)
+
+        // Running volume totals, updated by writers under the mutex
+        double total_bid_vol = 0.0;
+        double total_ask_vol = 0.0;
+
+        // Imbalance of the totals, published by writers as a single 64-bit atomic:
+        // readers load it without taking the mutex and never wait on a writer
+        std::atomic<double> imbalance{0.0};
+
+        // Recompute the imbalance from the totals and publish it (mutex held)
+        void publish_imbalance();
 
     public:
         OrderBook(); // Constructor definition
@@ -8,15 +8,70 @@ void PairStrategy::on_market_data(int symbol_type, double price, double quantity
     else if (symbol_type == 1) follower_book->add_order(price, quantity, is_bid);
 }
 
-int PairStrategy::check_signals() {
-    double leader_obi = leader_book->get_imbalance();
+template <typename Ticks>
+void PairStrategy::feed_batch(const Ticks& ticks, const float* price, const float* quantity, std::size_t n,
+                              const BatchOutputs& out, bool allow_short, double capital) {
+    const bool trade = out.position != nullptr;
+    for (std::size_t i = 0; i < n; ++i) {
+        int symbol_type = ticks.symbol(i);
+        on_market_data(symbol_type, price[i], quantity[i], ticks.bid(i));
+
+        // Compute the imbalance once and derive the signal from it
+        double leader_obi = leader_book->get_imbalance();
+        int signal = signal_from_imbalance(leader_obi);
+        out.obi[i] = static_cast<float>(leader_obi);
+        out.signal[i] = static_cast<int8_t>(signal);
+
+        if (trade) {
+            update_portfolio(symbol_type, price[i], signal, allow_short, capital);
+            out.position[i] = static_cast<int8_t>(position);
+            out.cash[i] = cash;
+        }
+    }
+}
+
+template void PairStrategy::feed_batch<TypedTicks>(const TypedTicks&, const float*, const float*, std::size_t,
+                                                   const BatchOutputs&, bool, double);
+template void PairStrategy::feed_batch<EncodedTicks>(const EncodedTicks&, const float*, const float*, std::size_t,
+                                                     const BatchOutputs&, bool, double);
+
+void PairStrategy::update_portfolio(int symbol_type, float price, int signal, bool allow_short, double capital) {
+    if (symbol_type == 0) {
+        last_leader_price = price;
+    } else if (symbol_type == 1 && last_leader_price > 0) {
+        // Target position of the signal; without a signal the position is held
+        int target = position;
+        if (signal == 1) target = 1;
+        else if (signal == -1) target = allow_short ? -1 : 0;
+
+        // No Long entry without the cash to pay for the unit
+        if (position == 0 && target == 1 && capital + cash < price) target = 0;
 
+        // Reversals trade two units (close + open) at the current price
+        cash -= (target - position) * static_cast<double>(price);
+        position = target;
+    }
+}
+
+int PairStrategy::signal_from_imbalance(double leader_obi) const {
     // Lead-Lag logic: Leader imbalance predicts Follower movement 
     if (leader_obi > entry_threshold) return 1;  // Signal to buy Follower
     else if (leader_obi < -entry_threshold) return -1; // Signal to sell Follower
     return 0; // No signal
 }
 
+void PairStrategy::reset() {
+    leader_book->clear();
+    follower_book->clear();
+    position = 0;
+    cash = 0.0;
+    last_leader_price = 0.0;
+}
+
+int PairStrategy::check_signals() {
+    return signal_from_imbalance(leader_book->get_imbalance());
+}
+
 double PairStrategy::get_leader_imbalance() {
     return leader_book->get_imbalance();
 }
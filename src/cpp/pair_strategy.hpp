@@ -1,24 +1,83 @@
 #pragma once
 #include "order_book.hpp"
+#include <cstddef>
+#include <cstdint>
+#include <limits>
 #include <memory>
 
 class OrderBook; // Forward declaration
 
+// Tick decoders of the batch loop: symbol(i) is the symbol type of tick i (0:leader, 1:follower)
+// and bid(i) its side, read from typed arrays...
+struct TypedTicks {
+    const int8_t* symbol_type;
+    const bool* is_bid;
+
+    int symbol(std::size_t i) const { return symbol_type[i]; }
+    bool bid(std::size_t i) const { return is_bid[i]; }
+};
+
+// ...or from dictionary-encoded columns (e.g. the indices of Arrow dictionary arrays, read in place):
+// a tick is the leader's when symbol_code == leader_code (the follower's otherwise) and a bid when
+// side_code == bid_code
+struct EncodedTicks {
+    const uint8_t* symbol_code;
+    uint8_t leader_code;
+    const uint8_t* side_code;
+    uint8_t bid_code;
+
+    int symbol(std::size_t i) const { return symbol_code[i] == leader_code ? 0 : 1; }
+    bool bid(std::size_t i) const { return side_code[i] == bid_code; }
+};
+
+// Per-tick outputs of a batch: the follower is only traded when position and cash are given
+struct BatchOutputs {
+    float* obi;
+    int8_t* signal;
+    int8_t* position = nullptr;
+    double* cash = nullptr;
+};
+
+// Not thread safe: the portfolio below is unguarded, so each thread needs its own PairStrategy
 class PairStrategy {
     private:
         std::unique_ptr<OrderBook> leader_book = std::make_unique<OrderBook>();
         std::unique_ptr<OrderBook> follower_book = std::make_unique<OrderBook>();
         double entry_threshold;
 
+        // Simulated portfolio of the follower, carried across feed_batch calls
+        int position = 0;               // 0=Flat, 1=Long, -1=Short
+        double cash = 0.0;              // Net cash flow from trades since construction
+        double last_leader_price = 0.0; // Trading starts once the leader has printed
+
+        // Map a leader imbalance to a signal: 1 buy, -1 sell, 0 hold
+        int signal_from_imbalance(double leader_obi) const;
+
+        // Apply the signal seen after a tick to the portfolio (see feed_batch)
+        void update_portfolio(int symbol_type, float price, int signal, bool allow_short, double capital);
+
     public:
         PairStrategy(double threshold);
         
         // Update market data. symbol_type; 0:leader, 1:follower
         void on_market_data(int symbol_type, double price, double quantity, bool is_bid);
 
+        // Feed n ticks in one call. For each tick, the leader imbalance (as float32) and the signal
+        // seen right after the tick is processed are written to out. When out has position and cash
+        // buffers, one unit of the follower is also traded on its ticks: a buy signal goes Long, a sell
+        // signal goes Short (or Flat when allow_short is false), and the position / cash flow after
+        // the tick are written. A Flat -> Long entry is skipped when capital plus the cash flow cannot
+        // pay the price. Instantiated for TypedTicks and EncodedTicks.
+        template <typename Ticks>
+        void feed_batch(const Ticks& ticks, const float* price, const float* quantity, std::size_t n,
+                        const BatchOutputs& out, bool allow_short = false,
+                        double capital = std::numeric_limits<double>::infinity());
+
+        // Clear both books (keeping their capacity) and the portfolio, as if newly constructed
+        void reset();
+
         // Check for trading signals based on imbalance
         int check_signals();
 
         double get_leader_imbalance();
 };
-
@@ -1,10 +1,20 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
-from engine.storage import MarketDataDB
+from tsdownsample import MinMaxLTTBDownsampler
+from engine.storage import MarketDataDB, fetch_arrow_table
 from engine.backtest_runner import BacktestRunner
 
+# Figures are serialized by plotly.io.to_json: use the faster orjson encoder
+pio.json.config.default_engine = "orjson"
+
 # Page Configuration
 st.set_page_config(page_title="HFT Causal Engine Dashboard", layout="wide")
 st.title("High-Frequency Causal Engine Dashboard")
@@ -13,14 +23,40 @@ st.markdown("Visual analysis of Lead-Lag correlation between Bitcoin (Leader) an
 # --- 1. DATA LOADING ---
 @st.cache_data
 def load_data():
-    db = MarketDataDB()
-    con = db.get_connection()
-    # Load more data to see trends better
-    df = con.execute("SELECT * FROM trades ORDER BY timestamp ASC LIMIT 10000").df()
-    return df
+    # Read-only handle opened per load: holding it would keep the DuckDB file locked against the loader
+    db = MarketDataDB(read_only=True)
+    try:
+        # Load more data to see trends better
+        # Only the columns the backtest reads, fetched as Arrow and kept Arrow-backed in pandas.
+        # The aggressor side is decoded once here: the backtest reads a boolean, not strings.
+        table = fetch_arrow_table(db.get_connection().execute(
+            "SELECT timestamp, symbol, price, quantity, side = 'buy' AS is_bid "
+            "FROM trades ORDER BY timestamp ASC LIMIT 10000"
+        ))
+    finally:
+        db.close()
+    df = table.to_pandas(types_mapper=pd.ArrowDtype)
+    # Content fingerprint of the ticks, used as cache key for the backtests
+    df_hash = hashlib.blake2b(
+        pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes(), digest_size=16
+    ).hexdigest()
+    return df, df_hash
+
+@st.cache_data(show_spinner=False, persist="disk")
+def run_backtests(df_hash, threshold, initial_capital, leader_symbol, follower_symbol, _df):
+    # Results are deterministic given the inputs: _df is excluded from hashing and identified by df_hash
+    runner_fn = partial(
+        BacktestRunner(threshold=threshold, initial_capital=initial_capital).run,
+        _df, leader_symbol, follower_symbol,
+    )
+    # The two models share no mutable state and the C++ feed releases the GIL: run them in parallel
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        fut_long = ex.submit(runner_fn, allow_short_selling=False)  # Model 1: Long Only
+        fut_short = ex.submit(runner_fn, allow_short_selling=True)  # Model 2: Long + Short
+        return fut_long.result(), fut_short.result()
 
 try:
-    df = load_data()
+    df, df_hash = load_data()
 except Exception as e:
     st.error(f"DB Error: {e}")
     st.stop()
@@ -41,14 +77,8 @@ if not leader_symbol or not follower_symbol:
     st.stop()
 
 with st.spinner("Running strategy simulations..."):
-    # Initialize runner
-    runner = BacktestRunner(threshold=threshold, initial_capital=initial_capital)
-    
-    # Model 1: Long Only
-    res_long = runner.run(df, leader_symbol, follower_symbol, allow_short_selling=False)
-    
-    # Model 2: Long + Short
-    res_short = runner.run(df, leader_symbol, follower_symbol, allow_short_selling=True)
+    # Cached per parameter set: revisiting a slider value does not re-run the simulations
+    res_long, res_short = run_backtests(df_hash, threshold, initial_capital, leader_symbol, follower_symbol, df)
 
 # --- 4. COMPARISON STATISTICS ---
 st.header("Strategy Performance Comparison")
@@ -62,6 +92,16 @@ col2.metric("Advanced Model (Long/Short)", f"{res_short['roi']:.2f}% ROI",
 st.divider()
 
 # --- 5. VISUALIZATION ---
+MAX_LINE_POINTS = 1500  # Points per line trace shipped to the browser
+
+def line_xy(res, key, n_out=MAX_LINE_POINTS):
+    """x/y of a history series, reduced with MinMaxLTTB so the plotted shape is preserved."""
+    # float32 is plenty for display and halves the encoded payload
+    x, y = res['history_timestamps'], np.asarray(res[key], dtype=np.float32)
+    if len(y) <= n_out:
+        return dict(x=x, y=y)
+    idx = MinMaxLTTBDownsampler().downsample(x, y, n_out=n_out)
+    return dict(x=x[idx], y=y[idx])
 
 # Create subplot with comparison (Enable dual axis for Row 1 and Row 3)
 fig = make_subplots(
@@ -73,95 +113,43 @@ fig = make_subplots(
     subplot_titles=("Model A: Long Only", "Model A: OBI", "Model B: Bidirectional (Long & Short)", "Model B: OBI")
 )
 
-# --- CHART A (LONG ONLY) ---
-# Price Line Follower (ETH) - Left Axis
-fig.add_trace(go.Scatter(
-    x=res_long['history_timestamps'], 
-    y=res_long['history_follower_price'], 
-    mode='lines', name=f'{follower_symbol} (Follower)', 
-    line=dict(color='#1f77b4', width=2)
-), row=1, col=1, secondary_y=False)
-
-# Price Line Leader (BTC) - Right Axis
-fig.add_trace(go.Scatter(
-    x=res_long['history_timestamps'], 
-    y=res_long['history_leader_price'], 
-    mode='lines', name=f'{leader_symbol} (Leader)', 
-    line=dict(color='#ff7f0e', width=1, dash='dot'), opacity=0.7
-), row=1, col=1, secondary_y=True)
-
-# Signals A - Row 1
-fig.add_trace(go.Scatter(
-    x=res_long['signals_buy']['x'], 
-    y=res_long['signals_buy']['y'], 
-    mode='markers', 
-    marker=dict(symbol='triangle-up', color='green', size=12), 
-    name='Buy (Long)',
-    text=res_long['signals_buy']['desc'],
-    hovertemplate="%{text}<extra></extra>"
-), row=1, col=1, secondary_y=False)
-
-fig.add_trace(go.Scatter(
-    x=res_long['signals_sell']['x'], 
-    y=res_long['signals_sell']['y'], 
-    mode='markers', 
-    marker=dict(symbol='triangle-down', color='black', size=12), 
-    name='Exit (Long)',
-    text=res_long['signals_sell']['desc'],
-    hovertemplate="%{text}<extra></extra>"
-), row=1, col=1, secondary_y=False)
-
-# --- OBI A - Row 2 ---
-fig.add_trace(go.Scatter(
-    x=res_long['history_timestamps'], 
-    y=res_long['history_leader_obi'], 
-    mode='lines', name='OBI (A)',    
-    line=dict(color='#9467bd', width=1), 
-    fill='tozeroy', showlegend=False
-), row=2, col=1)
-fig.add_hline(y=threshold, line_dash="dot", row=2, col=1, line_color="green")
-fig.add_hline(y=-threshold, line_dash="dot", row=2, col=1, line_color="red")
-fig.update_yaxes(range=[-1.1, 1.1], title_text="OBI", row=2, col=1)
-
-# --- CHART B (LONG + SHORT) ---
-# Price Line Follower (ETH) - Left Axis
-fig.add_trace(go.Scatter(
-    x=res_short['history_timestamps'], 
-    y=res_short['history_follower_price'], 
-    mode='lines', name=f'{follower_symbol} (Follower)', 
-    line=dict(color='#1f77b4', width=2),
-    showlegend=False
-), row=3, col=1, secondary_y=False)
-
-# Price Line Leader (BTC) - Right Axis
-fig.add_trace(go.Scatter(
-    x=res_short['history_timestamps'], 
-    y=res_short['history_leader_price'], 
-    mode='lines', name=f'{leader_symbol} (Leader)', 
-    line=dict(color='#ff7f0e', width=1, dash='dot'), opacity=0.7,
-    showlegend=False
-), row=3, col=1, secondary_y=True)
-
-# Signals B - Row 3
-fig.add_trace(go.Scatter(
-    x=res_short['signals_buy']['x'], 
-    y=res_short['signals_buy']['y'], 
-    mode='markers', 
-    marker=dict(symbol='triangle-up', color='green', size=12), 
-    name='Long / Cover',
-    text=res_short['signals_buy']['desc'],
-    hovertemplate="%{text}<extra></extra>"
-), row=3, col=1, secondary_y=False)
-
-fig.add_trace(go.Scatter(
-    x=res_short['signals_sell']['x'], 
-    y=res_short['signals_sell']['y'], 
-    mode='markers', 
-    marker=dict(symbol='triangle-down', color='red', size=12), 
-    name='Short / Close',
-    text=res_short['signals_sell']['desc'],
-    hovertemplate="%{text}<extra></extra>"
-), row=3, col=1, secondary_y=False)
+# Dense line series are drawn with WebGL (Scattergl); the sparse signal markers stay SVG (Scatter).
+# Traces are plain dicts added in one add_traces call: each is validated once, and the
+# per-call subplot resolution is paid once instead of once per trace
+def model_traces(res, price_row, obi_row, show_price_legend, buy_name, sell_name, sell_color, obi_name):
+    """(trace, row, secondary_y) of one model: prices and signals on price_row, OBI on obi_row."""
+    return [
+        # Price Line Follower (ETH) - Left Axis
+        (dict(type='scattergl', **line_xy(res, 'history_follower_price'),
+              mode='lines', name=f'{follower_symbol} (Follower)',
+              line=dict(color='#1f77b4', width=2), showlegend=show_price_legend), price_row, False),
+        # Price Line Leader (BTC) - Right Axis
+        (dict(type='scattergl', **line_xy(res, 'history_leader_price'),
+              mode='lines', name=f'{leader_symbol} (Leader)',
+              line=dict(color='#ff7f0e', width=1, dash='dot'), opacity=0.7,
+              showlegend=show_price_legend), price_row, True),
+        # Signals
+        (dict(type='scatter', x=res['signals_buy']['x'], y=res['signals_buy']['y'],
+              mode='markers', marker=dict(symbol='triangle-up', color='green', size=12),
+              name=buy_name, text=res['signals_buy']['desc'],
+              hovertemplate="%{text}<extra></extra>"), price_row, False),
+        (dict(type='scatter', x=res['signals_sell']['x'], y=res['signals_sell']['y'],
+              mode='markers', marker=dict(symbol='triangle-down', color=sell_color, size=12),
+              name=sell_name, text=res['signals_sell']['desc'],
+              hovertemplate="%{text}<extra></extra>"), price_row, False),
+        # OBI
+        (dict(type='scattergl', **line_xy(res, 'history_leader_obi'),
+              mode='lines', name=obi_name, line=dict(color='#9467bd', width=1),
+              fill='tozeroy', showlegend=False), obi_row, False),
+    ]
+
+# --- CHART A (LONG ONLY) rows 1-2 / CHART B (LONG + SHORT) rows 3-4 ---
+traces = (
+    model_traces(res_long, 1, 2, True, 'Buy (Long)', 'Exit (Long)', 'black', 'OBI (A)')
+    + model_traces(res_short, 3, 4, False, 'Long / Cover', 'Short / Close', 'red', 'OBI (B)')
+)
+data, rows, secondary_ys = zip(*traces)
+fig.add_traces(list(data), rows=list(rows), cols=[1] * len(data), secondary_ys=list(secondary_ys))
 
 # Axis Configuration & Cleaner Grid
 # Left Y-Axis (Follower) - Clean grid
@@ -173,8 +161,18 @@ fig.update_yaxes(title_text=f"{leader_symbol}", secondary_y=True, showgrid=False
 fig.update_yaxes(range=[-1.1, 1.1], title_text="OBI", row=2, col=1)
 fig.update_yaxes(range=[-1.1, 1.1], title_text="OBI", row=4, col=1)
 
+# Threshold lines of the OBI rows (row 2 -> x2/y3, row 4 -> x4/y6) as prebuilt layout shapes,
+# instead of add_hline resolving the subplot on every call
+threshold_shapes = [
+    dict(type='line', xref=f'{xaxis} domain', yref=yaxis, x0=0, x1=1, y0=level, y1=level,
+         line=dict(dash='dot', color=color))
+    for xaxis, yaxis in (('x2', 'y3'), ('x4', 'y6'))
+    for level, color in ((threshold, 'green'), (-threshold, 'red'))
+]
+
 # General Layout
 fig.update_layout(
+    shapes=threshold_shapes,
     height=1200,  # Increased total height for better view
     title_text="Strategy Execution Comparison",
     template="plotly_white",  # Cleaner white background
@@ -182,36 +180,17 @@ fig.update_layout(
     # Legend vertical on the right
     legend=dict(orientation="v", yanchor="top", y=1, xanchor="left", x=1.02)
 )
-fig.add_trace(go.Scatter(
-    x=res_short['history_timestamps'], 
-    y=res_short['history_leader_obi'], 
-    mode='lines', name='OBI (B)', 
-    line=dict(color='#9467bd', width=1), 
-    fill='tozeroy',
-    showlegend=False
-), row=4, col=1)
-fig.add_hline(y=threshold, line_dash="dot", row=4, col=1, line_color="green")
-fig.add_hline(y=-threshold, line_dash="dot", row=4, col=1, line_color="red")
-fig.update_yaxes(range=[-1.1, 1.1], row=4, col=1)
-
-fig.update_layout(height=800, title_text="Strategy Execution Comparison")
 st.plotly_chart(fig, use_container_width=True)
 
 # --- 6. EQUITY CURVE COMPARISON ---
 st.subheader(" Performance Analysis (Equity Curve)")
 fig_eq = go.Figure()
-fig_eq.add_trace(go.Scatter(
-    x=res_long['history_timestamps'], 
-    y=res_long['history_equity'], 
-    mode='lines', name='Equity Long Only', 
-    line=dict(color='blue')
-))
-fig_eq.add_trace(go.Scatter(
-    x=res_short['history_timestamps'], 
-    y=res_short['history_equity'], 
-    mode='lines', name='Equity Long/Short', 
-    line=dict(color='purple')
-))
+fig_eq.add_traces([
+    dict(type='scattergl', **line_xy(res_long, 'history_equity'),
+         mode='lines', name='Equity Long Only', line=dict(color='blue')),
+    dict(type='scattergl', **line_xy(res_short, 'history_equity'),
+         mode='lines', name='Equity Long/Short', line=dict(color='purple')),
+])
 
 fig_eq.update_layout(
     title="Equity Curve Comparison",
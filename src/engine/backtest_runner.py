@@ -5,9 +5,27 @@ Handles the execution of trading strategy backtests with C++ engine integration.
 
 import engine_core
 from typing import Dict, List, Tuple
+import numpy as np
 import pandas as pd
 
 
+# Label of each position transition (previous, new) for the signal tooltips
+_ACTIONS = {
+    (0, 1): "Long Entry",
+    (-1, 1): "Short Cover & Long Entry",
+    (0, -1): "Short Entry",
+    (1, -1): "Long Close & Short Entry",
+    (1, 0): "Long Close",
+}
+
+
+def _forward_fill(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Carry forward values[i] where mask[i] is True; positions before the first True are 0."""
+    idx = np.where(mask, np.arange(len(values)), -1)
+    np.maximum.accumulate(idx, out=idx)
+    return np.where(idx >= 0, values[idx], 0).astype(values.dtype)
+
+
 class BacktestRunner:
     """Executes a pairs trading backtest using the C++ engine."""
     
@@ -21,14 +39,15 @@ class BacktestRunner:
         """
         self.threshold = threshold
         self.initial_capital = initial_capital
-        # Strategy will be initialized per run to ensure clean state
+        # Strategy is created per run (not stored) so concurrent runs never share engine state
         
     def run(self, df: pd.DataFrame, leader_symbol: str, follower_symbol: str, allow_short_selling: bool = False) -> Dict:
         """
         Execute the backtest on historical data.
         
         Args:
-            df: DataFrame with columns: timestamp, symbol, price, quantity, side
+            df: DataFrame with columns: timestamp, symbol, price, quantity, is_bid
+                (is_bid: True when the aggressor side is 'buy')
             leader_symbol: Symbol of the leader asset (e.g., 'BTC-USD')
             follower_symbol: Symbol of the follower asset (e.g., 'ETH-USD')
             allow_short_selling: If True, enables short selling strategies.
@@ -36,91 +55,58 @@ class BacktestRunner:
         Returns:
             Dictionary containing simulation results.
         """
-        # Re-initialize strategy to ensure clean state for each run
-        self.strategy = engine_core.PairStrategy(self.threshold)
-        
-        # Initialize tracking variables
-        history_timestamps = []
-        history_leader_obi = []
-        history_follower_price = []
-        history_leader_price = []
-        history_equity = []
-        
+        # Fresh strategy for each run to ensure clean state
+        strategy = engine_core.PairStrategy(self.threshold)
+
+        # Extract columns once as contiguous arrays (no per-row Python objects)
+        timestamps = df['timestamp'].to_numpy()
+        prices = df['price'].to_numpy(np.float32)
+        quantities = df['quantity'].to_numpy(np.float32)
+        symbol_types = (df['symbol'] != leader_symbol).to_numpy(np.int8)
+        is_bid = df['is_bid'].to_numpy(bool)
+
+        # Feed every tick and simulate the portfolio in a single C++ call
+        obi, signal, tick_position, tick_cash_flow = strategy.run_backtest(
+            symbol_types, prices, quantities, is_bid, allow_short_selling
+        )
+
+        # Last known leader price at each tick (forward-filled, 0 before the first leader tick)
+        last_leader_price = _forward_fill(prices, symbol_types == 0)
+
+        # Record data when follower updates (for synchronization)
+        # Indices are computed once; each history is then a single gather into a compact typed array
+        follower_idx = np.flatnonzero((symbol_types == 1) & (last_leader_price > 0))
+        history_timestamps = timestamps[follower_idx]
+        history_leader_obi = obi[follower_idx]
+        history_follower_price = prices[follower_idx]
+        history_leader_price = last_leader_price[follower_idx]
+
+        # Position tracking: 0=Flat, 1=Long, -1=Short (state after each recorded tick)
+        # The engine only trades on these ticks, so the previous entry is the state before the tick
+        positions = tick_position[follower_idx]
+        previous_positions = np.concatenate(([0], positions[:-1])).astype(np.int8)
+        trade_sizes = positions - previous_positions
+        cash_after = self.initial_capital + tick_cash_flow[follower_idx]
+        cash_before = np.concatenate(([self.initial_capital], cash_after[:-1]))
+
+        # Equity = Cash + (Position * Current Price), measured before trading on the tick
+        # Works for short too: if position is -1, we subtract the cost to cover
+        history_equity = cash_before + previous_positions * history_follower_price
+
         signals_buy = {'x': [], 'y': [], 'desc': []}
         signals_sell = {'x': [], 'y': [], 'desc': []}
-        
-        # Position tracking: 0=Flat, 1=Long, -1=Short
-        position = 0
-        cash = self.initial_capital
-        last_leader_price = 0.0
-        
-        # Process each market data tick
-        for row in df.itertuples():
-            symbol_type = 0 if row.symbol == leader_symbol else 1
-            is_bid = True if row.side == 'buy' else False
-            
-            # Update leader price tracking
-            if symbol_type == 0:
-                last_leader_price = row.price
-            
-            # Update C++ engine
-            self.strategy.on_market_data(symbol_type, row.price, row.quantity, is_bid)
-            
-            # Record data when follower updates (for synchronization)
-            if symbol_type == 1 and last_leader_price > 0:
-                current_price = row.price
-                current_obi = self.strategy.get_leader_imbalance()
-                
-                history_timestamps.append(row.timestamp)
-                history_leader_obi.append(current_obi)
-                history_follower_price.append(current_price)
-                history_leader_price.append(last_leader_price)
-                
-                # Calculate and store current equity
-                # Equity = Cash + (Position * Current Price)
-                # Works for short too: if position is -1, we subtract the cost to cover
-                current_equity = cash + (position * current_price)
-                history_equity.append(current_equity)
-                
-                # Check for trading signals
-                signal = self.strategy.check_signals()
-                
-                if allow_short_selling:
-                    # --- SHORT SELLING LOGIC ---
-                    if signal == 1: # BUY SIGNAL
-                        if position == 0: # Flat -> Long
-                            position = 1
-                            cash -= current_price
-                            self._record_signal(signals_buy, row.timestamp, current_price, current_obi, "Long Entry", quantity=1.0)
-                        elif position == -1: # Short -> Long (Reverse)
-                            position = 1
-                            cash -= (current_price * 2) # Cover short + Go long
-                            self._record_signal(signals_buy, row.timestamp, current_price, current_obi, "Short Cover & Long Entry", quantity=2.0)
-                            
-                    elif signal == -1: # SELL SIGNAL
-                        if position == 0: # Flat -> Short
-                            position = -1
-                            cash += current_price # Receive cash from short sale
-                            self._record_signal(signals_sell, row.timestamp, current_price, current_obi, "Short Entry", quantity=1.0)
-                        elif position == 1: # Long -> Short (Reverse)
-                            position = -1
-                            cash += (current_price * 2) # Sell long + Go short
-                            self._record_signal(signals_sell, row.timestamp, current_price, current_obi, "Long Close & Short Entry", quantity=2.0)
-                
-                else:
-                    # --- LONG ONLY LOGIC ---
-                    if signal == 1 and position == 0: # Buy
-                        position = 1
-                        cash -= current_price
-                        self._record_signal(signals_buy, row.timestamp, current_price, current_obi, "Long Entry", quantity=1.0)
-                        
-                    elif signal == -1 and position > 0: # Sell to Close
-                        position = 0
-                        cash += current_price
-                        self._record_signal(signals_sell, row.timestamp, current_price, current_obi, "Long Close", quantity=1.0)
-        
+
+        # Only the (sparse) position changes are visited in Python
+        for i in np.flatnonzero(trade_sizes):
+            action_type = _ACTIONS[(int(previous_positions[i]), int(positions[i]))]
+            signal_dict = signals_buy if trade_sizes[i] > 0 else signals_sell
+            self._record_signal(signal_dict, history_timestamps[i], float(history_follower_price[i]),
+                                float(history_leader_obi[i]), action_type, quantity=float(abs(trade_sizes[i])))
+
         # Calculate final metrics
-        final_price = history_follower_price[-1] if history_follower_price else 0
+        position = int(positions[-1]) if len(positions) else 0
+        cash = float(cash_after[-1]) if len(cash_after) else float(self.initial_capital)
+        final_price = float(history_follower_price[-1]) if len(history_follower_price) else 0
         final_equity = cash + (position * final_price)
         roi = ((final_equity - self.initial_capital) / self.initial_capital) * 100
         total_trades = len(signals_buy['x']) + len(signals_sell['x'])
@@ -1,9 +1,11 @@
 import logging
 import time
+from typing import Optional
 
 import ccxt
 import numpy as np
 import pandas as pd
+import pyarrow as pa
 from .storage import MarketDataDB
 
 logging.basicConfig(
@@ -28,13 +30,16 @@ class DataLoader:
         # Initialize CCXT exchange instance (Kraken)
         self.exchange = ccxt.kraken()
 
-    def fetch_and_store_trades(self, symbol: str, limit: int = 1000) -> None:
+    def fetch_trades(self, symbol: str, limit: int = 1000) -> Optional[pd.DataFrame]:
         """
-        Fetches the most recent trades (ticks) for a symbol.
+        Fetches the most recent trades (ticks) for a symbol, shaped like the trades table.
 
         Args:
             symbol (str): Symbol in CCXT format (e.g., 'BTC/USDT').
             limit (int): Number of recent trades to fetch (Max usually 1000 per call).
+
+        Returns:
+            Optional[pd.DataFrame]: The trades, or None if the fetch failed or returned nothing.
         """
         logging.info(f"Fetching data for {symbol} with limit {limit}")
 
@@ -45,7 +50,7 @@ class DataLoader:
 
             if not trades:
                 logging.warning(f"No trade data returned for {symbol}.")
-                return
+                return None
 
             df = pd.DataFrame(trades)
 
@@ -70,20 +75,73 @@ class DataLoader:
             df["side"] = df["side"].fillna("unknown")
 
             # Reorder columns
-            df = df[["symbol", "timestamp", "price", "quantity", "side"]]
+            return df[["symbol", "timestamp", "price", "quantity", "side"]]
+
+        except Exception as e:
+            logging.error(f"Error fetching data for {symbol}: {e}")
+            return None
+
+    def store_trades(self, symbol: str, df: pd.DataFrame) -> int:
+        """
+        Inserts fetched trades into the database. Errors are raised, so a caller running
+        several inserts in one transaction can roll it back.
+
+        Args:
+            symbol (str): Symbol the trades were fetched for (used for logging).
+            df (pd.DataFrame): Trades as returned by fetch_trades.
+
+        Returns:
+            int: Number of rows inserted (duplicate ticks are skipped).
+        """
+        # Load data into DuckDB
+        conn = self.db.get_connection()
 
-            # Load data into DuckDB
-            conn = self.db.get_connection()
+        # Hand DuckDB an explicitly registered Arrow table: it is scanned with the vectorized
+        # Arrow reader instead of the pandas replacement scan of a local variable
+        trades_arrow = pa.Table.from_pandas(df, preserve_index=False)
+        conn.register("trades_arrow", trades_arrow)
+        try:
+            # The trades table has no primary key: skip the ticks already stored (consecutive fetches
+            # overlap) with an anti-join on the trade identity, restricted to the time span of the batch
+            # Rows are appended in time order so timestamp-ordered reads scan mostly sorted data
+            inserted = conn.execute(
+                """
+                INSERT INTO trades
+                SELECT DISTINCT ON (symbol, timestamp, price, quantity) * FROM trades_arrow AS new
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM trades AS old
+                    WHERE old.timestamp >= (SELECT min(timestamp) FROM trades_arrow)
+                      AND old.symbol = new.symbol AND old.timestamp = new.timestamp
+                      AND old.price = new.price AND old.quantity = new.quantity
+                )
+                ORDER BY timestamp
+                """
+            ).fetchone()[0]
+        finally:
+            conn.unregister("trades_arrow")
+
+        logging.info(
+            f"Successfully stored {inserted} new rows for {symbol} into the database "
+            f"({len(df) - inserted} duplicates skipped)."
+        )
+        return inserted
 
-            # 'INSERT OR IGNORE' to avoid duplicates based on primary key
-            conn.execute("INSERT OR IGNORE INTO trades SELECT * FROM df")
+    def fetch_and_store_trades(self, symbol: str, limit: int = 1000) -> None:
+        """
+        Fetches the most recent trades (ticks) for a symbol and stores them.
 
-            logging.info(
-                f"Successfully stored {len(df)} rows for {symbol} into the database."
-            )
+        Args:
+            symbol (str): Symbol in CCXT format (e.g., 'BTC/USDT').
+            limit (int): Number of recent trades to fetch (Max usually 1000 per call).
+        """
+        df = self.fetch_trades(symbol, limit=limit)
+        if df is None:
+            return
 
+        try:
+            self.store_trades(symbol, df)
         except Exception as e:
-            logging.error(f"Error fetching or storing data for {symbol}: {e}")
+            logging.error(f"Error storing data for {symbol}: {e}")
 
 
 if __name__ == "__main__":
@@ -92,10 +150,25 @@ if __name__ == "__main__":
 
     assets = ["BTC/USD", "ETH/USD"]
 
-    for asset in assets:
-        loader.fetch_and_store_trades(asset, limit=1000)
+    # Fetch every asset first, then store them in a single transaction kept off the network calls
+    fetched = {asset: loader.fetch_trades(asset, limit=1000) for asset in assets}
 
     con = db.get_connection()
+    con.begin()
+    try:
+        for asset, df in fetched.items():
+            if df is not None:
+                loader.store_trades(asset, df)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+    # Keep the table in time order for the backtest reads
+    db.compact()
+
+    # Write-once, read-many copy of the ticks for the backtest (run_backtest.py --parquet)
+    db.export_parquet("data/trades.parquet")
 
     # Count total ticks stored
     count = con.execute("SELECT count(*) FROM trades").fetchone()
@@ -4,11 +4,38 @@ This module contains classes and functions related to data storage management
 """
 
 import logging
+import os
 from pathlib import Path
 from typing import Optional
 
 import duckdb
 
+# Every value the 'side' column can take (unknown when the exchange does not report it)
+TRADE_SIDES = ("buy", "sell", "unknown")
+
+
+def sql_enum(values) -> str:
+    """
+    Build an inline DuckDB ENUM type from a list of strings, e.g. ENUM('buy', 'sell').
+
+    ENUM columns are stored and exported to Arrow as small dictionary indices,
+    so comparisons on them are integer compares instead of string compares.
+    """
+    quoted = ", ".join("'" + str(v).replace("'", "''") + "'" for v in values)
+    return f"ENUM({quoted})"
+
+
+def fetch_arrow_table(result):
+    """
+    Materialize a DuckDB query result as a pyarrow.Table.
+
+    DuckDB 1.5 deprecates fetch_arrow_table() in favour of to_arrow_table(), which
+    1.4 does not have (and .arrow() returns a Table on 1.4 but a reader on 1.5).
+    """
+    to_table = getattr(result, "to_arrow_table", None) or result.fetch_arrow_table
+    return to_table()
+
+
 # Set up logging configuration (useful for debugging and tracking)
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -21,20 +48,43 @@ class MarketDataDB:
     Designed for OLAP operations on financial time-series data.
     """
 
-    def __init__(self, db_path: str = "data/market_data.duckdb"):
+    def __init__(
+        self,
+        db_path: str = "data/market_data.duckdb",
+        threads: Optional[int] = None,
+        memory_limit: str = "2GB",
+        read_only: bool = False,
+    ):
         """
         Initializes the database connection.
 
         Args:
             db_path (str): The file path for the DuckDB database.
+            threads (Optional[int]): Worker threads for query execution (default: all cores).
+            memory_limit (str): Maximum memory DuckDB may use, e.g. '2GB'.
+            read_only (bool): Open an existing database read-only (no schema setup).
         """
 
         # Ensure the directory for the database exists
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
 
         self.db_path = db_path
-        self.conn = duckdb.connect(database=self.db_path)
-        self._initialize_scheme()
+        self.read_only = read_only
+        # Results without ORDER BY may come back in any order: lets DuckDB stream and
+        # parallelize scans instead of re-sequencing them (queries that need time order say so)
+        self.conn = duckdb.connect(
+            database=self.db_path,
+            read_only=read_only,
+            config={"preserve_insertion_order": False},
+        )
+
+        # Parallelize OLAP scans across all cores with a bounded memory footprint
+        self.conn.execute(f"PRAGMA threads={threads or os.cpu_count() or 1}")
+        self.conn.execute(f"PRAGMA memory_limit='{memory_limit}'")
+
+        # A read-only database is expected to be initialized already
+        if not read_only:
+            self._initialize_scheme()
         logging.info(f"Connected to DuckDB database at {self.db_path}")
 
     def _initialize_scheme(self) -> None:
@@ -44,7 +94,11 @@ class MarketDataDB:
 
         Schema decisions:
         - FLOAT4 is used for price data to optimize memory usage and vectorization speed.
+        - Trade timestamps are TIMESTAMP_NS: they reach Arrow/NumPy as plain int64 nanoseconds
+          (datetime64[ns]), the native pandas resolution, with no unit conversion on read.
         - The primary key (symbol, timestamp) prevents duplicate entries for the same candle.
+        - 'trades' has no primary key: enforcing it keeps an ART index that is checked on
+          every insert, which dominates bulk loads. Duplicates are filtered at load time.
         """
 
         query_ohlcv = """
@@ -63,24 +117,26 @@ class MarketDataDB:
         # New table for trades data
         # This table captures individual trade events and will use C++ engine
         """
-        timestamp: what time the trade occurred (ms precision)
+        timestamp: what time the trade occurred (exchange ms precision, stored as ns)
         price: price at which the trade was executed
         quantity: volume of the trade
         side: 'buy' or 'sell' indicating the trade direction
         """
 
-        query_trades = """
+        # 'side' has a fixed set of values and is stored as an ENUM (1 byte per row).
+        # 'symbol' stays TEXT because new assets can be loaded at any time; DuckDB
+        # dictionary-compresses it on disk and readers can cast it to an ENUM per query.
+        query_trades = f"""
         CREATE TABLE IF NOT EXISTS trades (
             symbol TEXT,
-            timestamp TIMESTAMP,
+            timestamp TIMESTAMP_NS,
             price FLOAT4,
             quantity FLOAT4,
-            side TEXT,
-            PRIMARY KEY (symbol, timestamp, price, quantity)
+            side {sql_enum(TRADE_SIDES)}
         );
         """
-        # Primay key is complext because in a ms can occur multiple trades at same price and quantity
-        # In prod we should consider adding a unique trade ID from the exchange
+        # A trade is identified by (symbol, timestamp, price, quantity): in a ms can occur multiple trades
+        # at same price and quantity. In prod we should consider adding a unique trade ID from the exchange
 
         try:
             self.conn.execute(query_ohlcv)
@@ -92,6 +148,58 @@ class MarketDataDB:
             logging.error(f"Error initializing database schema: {e}")
             raise
 
+    def compact(self) -> None:
+        """
+        Rewrite the trades table physically sorted by timestamp.
+
+        Fetches append in small batches, so the table drifts out of time order.
+        Once sorted, the min/max zonemaps of each row group let
+        'ORDER BY timestamp LIMIT k' skip most of the table instead of scanning
+        and top-K sorting all of it. The table is rebuilt in place, so the
+        schema is preserved. Run it periodically after loads.
+        """
+        try:
+            self.conn.execute("BEGIN TRANSACTION")
+            self.conn.execute("CREATE TEMP TABLE trades_sorted AS SELECT * FROM trades")
+            self.conn.execute("DELETE FROM trades")
+            # The ORDER BY sits on the INSERT itself: insertion order is not preserved otherwise
+            self.conn.execute(
+                "INSERT INTO trades SELECT * FROM trades_sorted ORDER BY timestamp"
+            )
+            self.conn.execute("DROP TABLE trades_sorted")
+            self.conn.execute("COMMIT")
+        except Exception as e:
+            self.conn.execute("ROLLBACK")
+            logging.error(f"Error compacting trades table: {e}")
+            raise
+
+        # Reclaim the space of the deleted row groups
+        self.conn.execute("CHECKPOINT")
+        logging.info("Trades table compacted (sorted by timestamp).")
+
+    def export_parquet(self, path: str = "data/trades.parquet") -> None:
+        """
+        Write the trades, sorted by timestamp, to a ZSTD-compressed Parquet file.
+
+        Tick data is written once and read many times: the Parquet copy is several
+        times smaller than the DuckDB file and DuckDB scans it in parallel straight
+        into Arrow with read_parquet(). Re-export after each load to keep it current.
+
+        Args:
+            path (str): Destination file, overwritten if present.
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        target = path.replace("'", "''")
+        try:
+            self.conn.execute(
+                f"COPY (SELECT * FROM trades ORDER BY timestamp) TO '{target}' "
+                "(FORMAT PARQUET, COMPRESSION ZSTD, ROW_GROUP_SIZE 100000)"
+            )
+        except Exception as e:
+            logging.error(f"Error exporting trades to Parquet: {e}")
+            raise
+        logging.info(f"Trades exported to {path}.")
+
     def get_connection(self) -> duckdb.DuckDBPyConnection:
         """
         Get the current database connection.
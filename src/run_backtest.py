@@ -1,166 +1,301 @@
 import sys
 import os
 import time
-import pandas as pd
+import argparse
+import math
+from typing import Optional
+import numpy as np
+import pyarrow as pa
 
 # Add src directory to path so engine_core.so can be found
 sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
 sys.path.append(os.getcwd())
 
 import engine_core
-from engine.storage import MarketDataDB
-from engine.data_loader import DataLoader
+from engine.storage import MarketDataDB, TRADE_SIDES, fetch_arrow_table, sql_enum
 import logging
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 
-def run_simulation():
+# Ticks per Arrow record batch fed to the C++ engine in one call
+BATCH_SIZE = 1 << 16
+
+
+class LatencyHistogram:
     """
-    Orchestrates the Event-Driven Backtest.
-    It feeds historical data tick-by-tick into the C++ engine 
-    and simulates trading execution.
+    Fixed-bucket log-linear histogram of latencies in ns (HDR-style): exact below 128 ns,
+    then 64 buckets per power of two (~1.6% resolution). Memory stays O(buckets) however
+    many samples are recorded; min, max and mean are exact.
     """
 
-    print("Starting Backtest Simulation...")
+    SUB_BITS = 7
+    MAX_NS = 1 << 40  # ~18 minutes: larger values are counted in the last bucket
 
-    # 1 - Initialize MarketDataDB and get connection
-    try:
-        db = MarketDataDB()
+    def __init__(self):
+        self.counts = np.zeros(self._index(self.MAX_NS) + 1, dtype=np.int64)
+        self.total = 0
+        self.sum_ns = 0
+        self.min_ns = self.MAX_NS
+        self.max_ns = 0
+
+    @classmethod
+    def _index(cls, value_ns: int) -> int:
+        exponent = max(value_ns.bit_length() - cls.SUB_BITS, 0)
+        return (exponent << (cls.SUB_BITS - 1)) + (value_ns >> exponent)
+
+    @classmethod
+    def _bucket_value(cls, index: int) -> float:
+        """Midpoint of the values counted in a bucket."""
+        exponent = max((index >> (cls.SUB_BITS - 1)) - 1, 0)
+        low = (index - (exponent << (cls.SUB_BITS - 1))) << exponent
+        return low + ((1 << exponent) - 1) / 2
+
+    def record(self, value_ns: int, count: int = 1) -> None:
+        """Count a latency value count times (e.g. the amortized per-tick latency of a batch)."""
+        value_ns = min(max(int(value_ns), 0), self.MAX_NS)
+        self.counts[self._index(value_ns)] += count
+        self.total += count
+        self.sum_ns += value_ns * count
+        self.min_ns = min(self.min_ns, value_ns)
+        self.max_ns = max(self.max_ns, value_ns)
+
+    def mean(self) -> float:
+        return self.sum_ns / self.total
+
+    def percentile(self, p: float) -> float:
+        """Value below which p% of the recorded samples fall (to the bucket resolution)."""
+        rank = max(math.ceil(p / 100 * self.total), 1)
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(max(self._bucket_value(index), self.min_ns), self.max_ns)
+
+
+class Backtester:
+    """
+    Event-Driven Backtest of the Leader/Follower strategy.
+    The trades are loaded from DuckDB once, as an Arrow table, and every run() feeds
+    the cached record batches into a fresh C++ engine: a sweep over N thresholds costs
+    one load plus N runs instead of N loads. The whole table is held in memory (unlike
+    a streamed scan), and run() may be called from several threads at once.
+    """
+
+    def __init__(self, db: MarketDataDB, parquet_path: Optional[str] = None):
+        """
+        Loads the trades and identifies the Leader (BTC) and Follower (ETH) symbols.
+
+        Args:
+            db (MarketDataDB): Database holding the trades (a read-only one is enough).
+            parquet_path (Optional[str]): Read the trades from this Parquet export
+                (see MarketDataDB.export_parquet) instead of the trades table of db.
+
+        Raises:
+            ValueError: If there are no trades or the Leader/Follower symbols are missing.
+        """
         con = db.get_connection()
 
-        print("MarketDataDB initialized successfully.")
+        # DuckDB scans the Parquet file natively (in parallel, straight into Arrow)
+        trades = "trades"
+        if parquet_path:
+            trades = "read_parquet('" + parquet_path.replace("'", "''") + "')"
+
+        self.trade_total = con.execute(f"SELECT count(*) FROM {trades}").fetchone()[0]
+        if self.trade_total == 0:
+            raise ValueError("No trade data found in the database. Please run the data loading script first.")
+
+        # We need to map symbols (e.g., 'BTC-USD') to integers (0 or 1)
+        # because the C++ engine expects integer identifiers for assets.
+        self.symbols = [row[0] for row in con.execute(f"SELECT DISTINCT symbol FROM {trades}").fetchall()]
+
+        self.leader_symbol = None
+        self.follower_symbol = None
+
+        # Simple logic to find BTC (Leader) and ETH (Follower)
+        for sym in self.symbols:
+            if "BTC" in sym:
+                self.leader_symbol = sym
+            elif "ETH" in sym:
+                self.follower_symbol = sym
+
+        if not self.leader_symbol or not self.follower_symbol:
+            raise ValueError("Could not identify Leader (BTC) and Follower (ETH) symbols in the data.")
 
         # IMPORTANT: We must order by timestamp ASCENDING to simulate real-time data flow
-        query = "SELECT * FROM trades ORDER BY timestamp ASC"
-        df = con.execute(query).df()
+        # symbol and side are cast to ENUMs: Arrow receives them dictionary-encoded, so each tick
+        # carries a 1-byte index into the (symbols / TRADE_SIDES) lists instead of a string
+        query = f"""
+            SELECT timestamp, symbol::{sql_enum(self.symbols)} AS symbol, price, quantity,
+                   side::{sql_enum(TRADE_SIDES)} AS side
+            FROM {trades} ORDER BY timestamp ASC
+        """
+        self.table = fetch_arrow_table(con.execute(query))
+        # The engine reads 1-byte dictionary codes: with more than 255 symbols DuckDB emits wider indices
+        if not pa.types.is_uint8(self.table.schema.field("symbol").type.index_type):
+            raise ValueError(f"Too many symbols ({len(self.symbols)}) for 1-byte dictionary codes.")
+        self.batches = self.table.to_batches(max_chunksize=BATCH_SIZE)
+        self.leader_id = self.symbols.index(self.leader_symbol)
+        self.buy_id = TRADE_SIDES.index("buy")
+
+        # The Follower rows do not depend on the strategy: its last price (used to value the final
+        # position) is found once, with a dictionary-code mask over the last batch holding the Follower
+        self.last_follower_price = 0.0
+        for batch in reversed(self.batches):
+            follower_mask = batch.column("symbol").indices.to_numpy() != self.leader_id
+            if follower_mask.any():
+                self.last_follower_price = float(batch.column("price").to_numpy()[follower_mask][-1])
+                break
+
+    def run(self, threshold: float, initial_capital: float = 10000) -> dict:
+        """
+        Backtests one OBI threshold on the cached trades.
+
+        The position state machine runs inside the C++ engine: on a Follower tick a buy signal
+        goes Long 1 unit and a sell signal closes it (Long Only); cash flows are tracked there too.
+        A buy is skipped when the cash left cannot pay for the unit.
+
+        Args:
+            threshold (float): Order Book Imbalance threshold of the strategy.
+            initial_capital (float): Starting cash.
 
-        if df.empty:
-            logging.warning("No trade data found in the database. Please run the data loading script first.")
-            return
-        print(df.head(1))
-        print(f"Fetched {len(df)} trades from the database for simulation.")
+        Returns:
+            dict: Trade log, final portfolio, equity, ROI and the engine latency samples.
+        """
+        strategy = engine_core.PairStrategy(threshold)
+
+        # Engine outputs (OBI, signal, position, cash flow) are written into one set of buffers reused by
+        # every batch of this run; each run owns its buffers, so runs can execute in parallel threads
+        out_buffers = (np.empty(BATCH_SIZE, np.float32), np.empty(BATCH_SIZE, np.int8),
+                       np.empty(BATCH_SIZE, np.int8), np.empty(BATCH_SIZE, np.float64))
+
+        cash = initial_capital
+        position = 0.0  # Amount of Follower asset (ETH) we hold
+        trade_log = []  # (timestamp, action, price, cash, position) of every executed trade
+
+        # Amortized engine latency per tick of each batch (ns), counted once per tick of the batch
+        latency = LatencyHistogram()
+        batch_count = 0
+        for batch in self.batches:
+            # Empty chunks of the table yield zero-row batches: nothing to feed or time
+            if not batch.num_rows:
+                continue
+
+            # Prepare data for C++ engine: zero-copy NumPy views over the Arrow buffers
+            # The engine maps the dictionary codes itself: the symbol code of the Leader -> 0 (else 1),
+            # the side code of 'buy' -> is_bid = True ('buy' means the aggressor bouth, price likely to go up)
+            symbol_codes = batch.column("symbol").indices.to_numpy()
+            side_codes = batch.column("side").indices.to_numpy()
+            prices = batch.column("price").to_numpy()
+            quantities = batch.column("quantity").to_numpy()
+
+            # Feed the whole batch into the C++ engine, which also trades the Follower on its signals,
+            # and get the position and the cumulative cash flow after every tick
+            batch_start = time.perf_counter_ns()
+            _, _, positions, cash_flows = strategy.run_backtest_encoded(
+                symbol_codes, self.leader_id, prices, quantities, side_codes, self.buy_id,
+                initial_capital=initial_capital, out=tuple(buffer[:batch.num_rows] for buffer in out_buffers)
+            )
+            latency.record((time.perf_counter_ns() - batch_start) // batch.num_rows, batch.num_rows)
+            batch_count += 1
+
+            # A trade happened wherever the position changed: the rows of the trades are gathered
+            # column by column (one take per column, no per-row scalar objects) and zipped as plain values
+            trade_ticks = np.flatnonzero(np.diff(positions, prepend=np.int8(position)))
+            trade_positions = positions[trade_ticks]
+            trade_log.extend(zip(
+                batch.column("timestamp").take(trade_ticks).to_pylist(),
+                np.where(trade_positions > 0, "BUY", "SELL").tolist(),
+                prices[trade_ticks].astype(np.float64).tolist(),
+                (initial_capital + cash_flows[trade_ticks]).tolist(),
+                trade_positions.astype(np.float64).tolist(),
+            ))
+
+            position = float(positions[-1])
+            cash = initial_capital + float(cash_flows[-1])
+
+        # Calculate perfrormance metrics at the end of the simulation
+        # The open position is valued at the last Follower price
+        final_equity = cash + (position * self.last_follower_price)
+
+        return {
+            'trade_log': trade_log,
+            'final_cash': cash,
+            'final_position': position,
+            'final_equity': final_equity,
+            'roi': ((final_equity - initial_capital) / initial_capital) * 100,
+            'batch_count': batch_count,
+            'latency': latency,
+            'final_leader_imbalance': strategy.get_leader_imbalance(),
+        }
+
+
+def run_simulation(verbose=False, parquet_path=None):
+    """
+    Orchestrates the Event-Driven Backtest.
+    It loads historical data once, feeds it in record batches into the C++ engine,
+    which processes them tick-by-tick, and simulates trading execution.
+    With verbose=True the full trade log is printed after the run; with a parquet_path
+    the trades are read from that Parquet export instead of the DuckDB file.
+    """
+
+    print("Starting Backtest Simulation...")
+
+    # 1 - Initialize MarketDataDB and load the trades
+    # The backtest only reads: one read-only connection (no schema setup, no write lock) serves every query
+    # A Parquet export needs no database file: an in-memory DuckDB scans it
+    try:
+        db = MarketDataDB(":memory:") if parquet_path else MarketDataDB(read_only=True)
+        print("MarketDataDB initialized successfully.")
+
+        backtester = Backtester(db, parquet_path)
 
     except Exception as e:
         logging.error(f"Error initializing database or fetching data: {e}")
         return
-    
-    # 2 - Simulate feeding data tick-by-tick into the C++ engine
-    # We need to map symbols (e.g., 'BTC-USD') to integers (0 or 1)
-    # because the C++ engine expects integer identifiers for assets.
-    symbols = df["symbol"].unique()
-    print(f"Unique symbols in data: {symbols}")
-
-    leader_symbol = None
-    follower_symbol = None
-
-    # Simple logic to find BTC (Leader) and ETH (Follower)
-    for sym in symbols:
-        if "BTC" in sym:
-            leader_symbol = sym
-        elif "ETH" in sym:
-            follower_symbol = sym
-
-    if not leader_symbol or not follower_symbol:
-        logging.error("Could not identify Leader (BTC) and Follower (ETH) symbols in the data.")
-        return
-    
-    print(f"Identified Leader: {leader_symbol}, Follower: {follower_symbol}")
 
-    # 3 - Initialize the C++ Engine
-    # We set the thresholld for Order Boook Imbalance 
-    # 0.2 means: if OBI > 0.2 (strong by pressure), generate a signal
+    print(f"Found {backtester.trade_total} trades in the database for simulation.")
+    print(f"Unique symbols in data: {backtester.symbols}")
+    print(f"Identified Leader: {backtester.leader_symbol}, Follower: {backtester.follower_symbol}")
+
+    # 2 - Run the C++ Engine
+    # We set the thresholld for Order Boook Imbalance
+    # 0.2 means: if OBI > 0.2 (strong by pressure), generate a signal
     # We use a low threshold for testing to see more signals generated
-    strategy_threshold = 0.2
-    strategy = engine_core.PairStrategy(strategy_threshold)
-
-
-    # 4 - Portfolio Variables (Simulation of capital and positions)
-    initial_capital = 10000  # $10k starting capital 
-    cash = initial_capital
-    position = 0.0  # Amount of Follower asset (ETH) we hold
-    trade_count = 0 
-
-    # 5 - Simulate tick-by-tick processing
-    # Each row in the DataFrame represents a trade tick. We will feed it into the C++ engine.
-    tick_times = []
-    for row in df.itertuples():
-        tick_start = time.perf_counter_ns()
-
-        # Prepare data for C++ engine
-        # We need to convert the symbol to an integer ID (0 for Leader, 1 for Follower)
-        symbol_id = 0 if row.symbol == leader_symbol else 1
-
-        # Map the 'side' string to a boolean
-        # 'buy' means the aggressor bouth (price likely to go up) ->  is_bid = True
-        is_bid = True if row.side == 'buy' else False
-
-        # Feed the tick into the C++ engine and get a signal
-        strategy.on_market_data(symbol_id, row.price, row.quantity, is_bid)
-
-        # Check if the strategy generated a signal
-        signal = strategy.check_signals()
-        
-        # Execute trades based on the signal
-        current_price = row.price  # Current price of the Follower asset (ETH)
-
-        # If the current row (tick) is not for the Follower asset, we skip trade execution logic
-        # we only trade ETH based on BTC signals
-        if symbol_id != 1:
-            continue
-
-        # BUY LOGIC: if signal is 1 and we don't have a position, we buy ( 1 trade at a time for simplicity)
-        if signal == 1 and position == 0.0:
-            cost = current_price * 1  # Buying 1 unit of ETH
-
-            # Check if we have enough cash to buy
-            if cash >= cost:
-                cash -= cost
-                position += 1.0
-                trade_count += 1
-                print(f"[{row.timestamp}] BUY: Bought 1 unit of {follower_symbol} at ${current_price:.2f}. Cash: ${cash:.2f}, Position: {position} units")
-
-        # SELL LOGIC: if signal is -1 and we have a position, we sell
-        elif signal == -1 and position > 0.0:
-            revenue = current_price * 1  # Selling 1 unit of ETH
-
-            cash += revenue
-            position -= 1.0
-            trade_count += 1
-            print(f"[{row.timestamp}] SELL: Sold 1 unit of {follower_symbol} at ${current_price:.2f}. Cash: ${cash:.2f}, Position: {position} units")
-
-        tick_elapsed_ns = time.perf_counter_ns() - tick_start
-        tick_times.append(tick_elapsed_ns)
-        print(f"Done processing tick. Latency: {tick_elapsed_ns / 1000:.2f} µs")
-
-    # --- Tick Processing Latency Statistics ---
-    if tick_times:
-        import numpy as np
-        arr = np.array(tick_times, dtype=float) / 1000.0  # convert to µs
-        print(f"\n--- TICK LATENCY STATS ---")
-        print(f"Total ticks processed: {len(arr)}")
-        print(f"Mean latency:   {arr.mean():.2f} µs")
-        print(f"Median latency: {np.median(arr):.2f} µs")
-        print(f"Min latency:    {arr.min():.2f} µs")
-        print(f"Max latency:    {arr.max():.2f} µs")
-        print(f"P95 latency:    {np.percentile(arr, 95):.2f} µs")
-        print(f"P99 latency:    {np.percentile(arr, 99):.2f} µs")
-        print(f"--------------------------\n")
+    # $10k starting capital
+    initial_capital = 10000
+    result = backtester.run(0.2, initial_capital)
+    trade_log = result['trade_log']
 
-    # 6 - Calculate perfrormance metrics at the end of the simulation
-    last_known_price = df.iloc[-1]['price']
-    final_equity = cash + (position * last_known_price)
+    # --- Trade Log (kept out of the hot loop: printing costs far more than the engine itself) ---
+    if verbose:
+        for timestamp, action, price, cash_after, position_after in trade_log:
+            print(f"[{timestamp}] {action}: 1 unit of {backtester.follower_symbol} at ${price:.2f}. Cash: ${cash_after:.2f}, Position: {position_after} units")
 
-    roi = ((final_equity - initial_capital) / initial_capital) * 100
+    # --- Engine Latency Statistics (amortized per tick within each batch) ---
+    latency = result['latency']
+    if latency.total:
+        # Values are in ns: convert to µs
+        print(f"\n--- TICK LATENCY STATS ---")
+        print(f"Total ticks processed: {backtester.trade_total} in {result['batch_count']} batches")
+        print(f"Mean latency:   {latency.mean() / 1000.0:.2f} µs")
+        print(f"Median latency: {latency.percentile(50) / 1000.0:.2f} µs")
+        print(f"Min latency:    {latency.min_ns / 1000.0:.2f} µs")
+        print(f"Max latency:    {latency.max_ns / 1000.0:.2f} µs")
+        print(f"P95 latency:    {latency.percentile(95) / 1000.0:.2f} µs")
+        print(f"P99 latency:    {latency.percentile(99) / 1000.0:.2f} µs")
+        print(f"--------------------------\n")
 
     print("\n--- BACKTEST RESULTS ---")
-    print(f"Total Trades Executed: {trade_count}")
-    print(f"Number of assets held at the end: {position} units of {follower_symbol}")
+    print(f"Total Trades Executed: {len(trade_log)} ({sum(t[1] == 'BUY' for t in trade_log)} buys, {sum(t[1] == 'SELL' for t in trade_log)} sells)")
+    print(f"Number of assets held at the end: {result['final_position']} units of {backtester.follower_symbol}")
     print(f"Initial Capital:       ${initial_capital:.2f}")
-    print(f"Final Equity:          ${final_equity:.2f}")
-    print(f"Return on Investment:  {roi:.4f}%")
+    print(f"Final Equity:          ${result['final_equity']:.2f}")
+    print(f"Return on Investment:  {result['roi']:.4f}%")
     print("------------------------")
-    
+
     # Debug info from C++ engine
-    print(f"Final Leader Imbalance (C++ internal state): {strategy.get_leader_imbalance():.4f}")
+    if verbose:
+        print(f"Final Leader Imbalance (C++ internal state): {result['final_leader_imbalance']:.4f}")
 
 if __name__ == "__main__":
-    run_simulation()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the Leader/Follower backtest on the stored trades.")
+    parser.add_argument("--verbose", action="store_true", help="print every executed trade and the engine's final state")
+    parser.add_argument("--parquet", metavar="PATH", help="read the trades from a Parquet export (e.g. data/trades.parquet)")
+    args = parser.parse_args()
+    run_simulation(verbose=args.verbose, parquet_path=args.parquet)
@@ -1,38 +1,59 @@
-import random
+import os
 import threading
 import time
 
 import engine_core
+import numpy as np
 
 print("--- CONCURRENCY TEST ---")
 
 book = engine_core.OrderBook()
 running = True
 
+# Cores this process may run on (Linux only: elsewhere threads are left unpinned)
+try:
+    CPUS = sorted(os.sched_getaffinity(0))
+except AttributeError:
+    CPUS = []
+
+
+def pin_thread(slot):
+    """Pin the calling thread to one core, so it keeps its caches and is not migrated mid-test"""
+    if not CPUS:
+        return
+    try:
+        os.sched_setaffinity(0, {CPUS[slot % len(CPUS)]})  # 0 = the calling thread
+    except OSError as e:
+        print(f"Thread pinning unavailable: {e}")
+
+# Random prices, quantities and sides are generated upfront (as Python lists, so the loop only
+# indexes them): the writer spends its time in the C++ book, not in the random generator
+ORDER_POOL = 1_000_000
+order_rng = np.random.default_rng()
+order_prices = (100.0 + order_rng.uniform(-5, 5, ORDER_POOL)).astype(np.float32).tolist()
+order_quantities = order_rng.uniform(0.1, 2.0, ORDER_POOL).astype(np.float32).tolist()
+order_sides = order_rng.integers(0, 2, ORDER_POOL).astype(bool).tolist()
+
 
 def writer_job():
-    """Simulates the market rapidly sending orders"""
+    """Simulates the market rapidly sending orders (no delay: the mutex is under full pressure)"""
+    pin_thread(0)
     count = 0
     while running:
-        # Random price and quantity
-        p = 100.0 + random.uniform(-5, 5)
-        q = random.uniform(0.1, 2.0)
-        is_bid = random.choice([True, False])
-
-        book.add_order(p, q, is_bid)
+        i = count % ORDER_POOL
+        book.add_order(order_prices[i], order_quantities[i], order_sides[i])
         count += 1
-        # Simulate a tiny delay to mimic real-world conditions
-        time.sleep(0.0001)
     print(f"Writer Thread has inserted {count} orders.")
 
 
 def reader_job():
     """Simulates the strategy reading the imbalance"""
+    pin_thread(1)  # Its own core (the same one only on single-core machines)
     read_count = 0
     while running:
         try:
-            # Without the mutex, this call while the other writes
-            # would crash everything.
+            # Lock-free read of the imbalance published by the writer:
+            # it never waits on the mutex held by add_order.
             obi = book.get_imbalance()
             read_count += 1
         except Exception as e:
@@ -57,4 +78,47 @@ t_reader.join()
 
 print("\n✅ TEST COMPLETED")
 print(f"Final Orders in Book: {book.get_bid_count() + book.get_ask_count()}")
-print("If you see this message without strange errors or crashes, the C++ Mutex works!")
+print("If you see this message without strange errors or crashes, the C++ Mutex and the atomic imbalance work!")
+
+# Two backtests in parallel threads: run_backtest releases the GIL, so they overlap
+print("\n--- PARALLEL BACKTEST TEST ---")
+rng = np.random.default_rng(42)
+N = 20_000
+symbol_types = rng.integers(0, 2, N, dtype=np.int8)
+prices = (100.0 + rng.uniform(-5, 5, N)).astype(np.float32)
+quantities = rng.uniform(0.1, 2.0, N).astype(np.float32)
+sides = rng.integers(0, 2, N).astype(bool)
+
+
+def backtest_job(allow_short, results):
+    strategy = engine_core.PairStrategy(0.05)
+    results[allow_short] = strategy.run_backtest(
+        symbol_types, prices, quantities, sides, allow_short
+    )
+
+
+start = time.perf_counter()
+sequential = {}
+backtest_job(False, sequential)
+backtest_job(True, sequential)
+sequential_time = time.perf_counter() - start
+
+start = time.perf_counter()
+parallel = {}
+jobs = [
+    threading.Thread(target=backtest_job, args=(allow_short, parallel))
+    for allow_short in (False, True)
+]
+for job in jobs:
+    job.start()
+for job in jobs:
+    job.join()
+parallel_time = time.perf_counter() - start
+
+for allow_short in (False, True):
+    for seq_arr, par_arr in zip(sequential[allow_short], parallel[allow_short]):
+        assert np.array_equal(seq_arr, par_arr)
+
+print(f"Sequential: {sequential_time:.3f}s, Threads: {parallel_time:.3f}s")
+print(f"Speedup: {sequential_time / parallel_time:.2f}x on {os.cpu_count()} cores")
+print("✅ Threaded backtests match the sequential results.")
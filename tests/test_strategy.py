@@ -70,3 +70,80 @@ if signal == -1:
     print("Lead-Lag logic confirmed: BTC Crash -> Sell ETH.")
 else:
     print("❌ Errore nel segnale di vendita.")
+
+# 5. Batch Feed (one C++ call for many ticks)
+print("\n[T=3] Batch feed must match tick-by-tick feed...")
+import numpy as np
+
+symbol_types = np.array([LEADER, LEADER, FOLLOWER, LEADER, FOLLOWER], dtype=np.int8)
+prices = np.array([100.0, 101.0, 50.0, 100.5, 50.5], dtype=np.float32)
+quantities = np.array([5.0, 1.0, 2.0, 3.0, 1.0], dtype=np.float32)
+sides = np.array([BID, ASK, BID, ASK, ASK])
+
+strategy = engine_core.PairStrategy(0.3)
+batch_obi, batch_signal = strategy.on_market_data_batch(
+    symbol_types, prices, quantities, sides
+)
+
+strategy = engine_core.PairStrategy(0.3)
+for i in range(len(prices)):
+    strategy.on_market_data(
+        int(symbol_types[i]), float(prices[i]), float(quantities[i]), bool(sides[i])
+    )
+    assert abs(batch_obi[i] - strategy.get_leader_imbalance()) < 1e-6  # float32 output
+    assert batch_signal[i] == strategy.check_signals()
+
+print(f"✅ Batch OBI: {np.round(batch_obi, 4)} -> Signals: {batch_signal}")
+
+# Same ticks as dictionary codes (e.g. Arrow indices): symbols ['ETH', 'BTC'], sides ['sell', 'buy']
+strategy = engine_core.PairStrategy(0.3)
+symbol_codes = np.where(symbol_types == LEADER, 1, 0).astype(np.uint8)
+side_codes = sides.astype(np.uint8)
+encoded_obi, encoded_signal, _, _ = strategy.run_backtest_encoded(
+    symbol_codes, 1, prices, quantities, side_codes, 1
+)
+assert np.array_equal(encoded_obi, batch_obi)
+assert np.array_equal(encoded_signal, batch_signal)
+print("✅ Dictionary-encoded feed matches the batch feed.")
+
+# 6. Portfolio Simulation in C++
+print("\n[T=4] Backtest loop in C++ (Long Only vs Long/Short)...")
+symbol_types = np.array([LEADER, FOLLOWER, LEADER, FOLLOWER], dtype=np.int8)
+prices = np.array([100.0, 50.0, 100.0, 40.0], dtype=np.float32)
+quantities = np.array([5.0, 1.0, 20.0, 1.0], dtype=np.float32)
+sides = np.array([BID, BID, ASK, BID])
+
+for allow_short, expected_position, expected_cash in [(False, 0, -10.0), (True, -1, 30.0)]:
+    strategy = engine_core.PairStrategy(0.3)
+    _, signal, position, cash = strategy.run_backtest(
+        symbol_types, prices, quantities, sides, allow_short
+    )
+    assert list(signal) == [1, 1, -1, -1]
+    assert position[-1] == expected_position and abs(cash[-1] - expected_cash) < 1e-9
+    print(f"✅ allow_short={allow_short}: positions {position.tolist()}, cash flow {cash[-1]:.2f}")
+
+# Capital below the Follower price: the buy signal cannot be paid, so no trade happens
+strategy = engine_core.PairStrategy(0.3)
+_, signal, position, cash = strategy.run_backtest(
+    symbol_types, prices, quantities, sides, False, initial_capital=49.0
+)
+assert signal[1] == 1 and not position.any() and not cash.any()
+print("✅ With $49 of capital the $50 Follower unit is not bought")
+
+# Same backtest on dictionary-encoded columns (symbol code 2 = leader, side code 0 = bid)
+symbol_codes = np.where(symbol_types == LEADER, 2, 1).astype(np.uint8)
+side_codes = np.where(sides, 0, 1).astype(np.uint8)
+strategy, encoded = engine_core.PairStrategy(0.3), engine_core.PairStrategy(0.3)
+expected = strategy.run_backtest(symbol_types, prices, quantities, sides, True)
+result = encoded.run_backtest_encoded(symbol_codes, 2, prices, quantities, side_codes, 0, True)
+assert all(np.array_equal(a, b) for a, b in zip(expected, result))
+print("✅ Encoded feed trades exactly like the typed feed")
+
+print("\n[T=5] Reusing the strategy (reset) and preallocated output buffers...")
+buffers = (np.empty(8, np.float32), np.empty(8, np.int8), np.empty(8, np.int8), np.empty(8, np.float64))
+encoded.reset()
+result = encoded.run_backtest_encoded(symbol_codes, 2, prices, quantities, side_codes, 0, True,
+                                      out=tuple(b[:4] for b in buffers))
+assert all(np.array_equal(a, b) for a, b in zip(expected, result))
+assert np.shares_memory(result[2], buffers[2])
+print("✅ After reset() the same run gives the same results, written into the caller's buffers")